@@ -2,64 +2,452 @@ import sys
 import os
 import cv2
 import numpy as np
+import torch
 import time
+import queue
+import threading
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
 from PyQt5.QtWidgets import (
     QApplication, QMainWindow, QLabel, QPushButton, QVBoxLayout, QHBoxLayout,
     QWidget, QFileDialog, QComboBox, QScrollArea, QMessageBox, QStatusBar,
     QProgressBar, QFrame, QSizePolicy
 )
 from PyQt5.QtGui import QPixmap, QImage, QFont
-from PyQt5.QtCore import Qt, QTimer, QThread, pyqtSignal
+from PyQt5.QtCore import Qt, QTimer, QThread, QElapsedTimer, QMutex, QMutexLocker, QWaitCondition, QEvent, pyqtSignal
+from ultralytics.engine.results import Results
+
+import nms
+from model_utils import (
+    load_optimized_model, openvino_dir_for, int8_dir_for, collect_calib_frames, quantize_model,
+    configure_torch, configure_opencv, resize, bgr_to_rgb, read_image,
+    get_backend, letterbox_into, warmup_model, EXPORT_IMGSZ,
+    default_device, engine_path_for, export_engine, open_capture
+)
 
-from ultralytics import YOLO
+# 旧版 PyQt5 不支持 BGR888 时回退到 cvtColor + RGB888
+HAS_BGR888 = hasattr(QImage, 'Format_BGR888')
 
-class VideoWorker(QThread):
-    frame_ready = pyqtSignal(np.ndarray, dict)  # 帧与统计信息
+class FrameGrabber(QThread):
+    """独立读帧线程：摄像头只保留最新帧，视频文件按顺序阻塞缓冲不丢帧"""
 
-    def __init__(self, model, video_source=0, conf_threshold=0.3):
+    def __init__(self, video_source=0):
         super().__init__()
-        self.model = model
         self.video_source = video_source
-        self.conf_threshold = conf_threshold
+        self.live = isinstance(video_source, int)
         self.running = True
+        self.finished_reading = False
         self.cap = None
+        self._cond = threading.Condition(threading.Lock())
+        self._frames = deque(maxlen=2)  # 摄像头：满时丢弃最旧帧
+        self._queue = queue.Queue(maxsize=8)  # 视频文件：满时阻塞读帧
 
     def run(self):
-        self.cap = cv2.VideoCapture(self.video_source)
+        self.cap = open_capture(self.video_source)
         while self.running and self.cap.isOpened():
             ret, frame = self.cap.read()
             if not ret:
-                self.running = False
                 break
-
-            results = self.model(frame, conf=self.conf_threshold, device='cpu')
-            annotated_frame = results[0].plot()
-            stats = self.extract_stats(results[0])
-            self.frame_ready.emit(annotated_frame, stats)
+            if self.live:
+                with self._cond:
+                    self._frames.append(frame)
+                    self._cond.notify()
+            else:
+                while self.running:
+                    try:
+                        self._queue.put(frame, timeout=0.1)
+                        break
+                    except queue.Full:
+                        continue
 
         self.cap.release()
+        with self._cond:
+            self.finished_reading = True
+            self._cond.notify_all()
+
+    def latest(self, timeout=0.1):
+        """取下一帧；摄像头返回最新帧，超时或读完返回 None"""
+        if not self.live:
+            try:
+                return self._queue.get(timeout=timeout)
+            except queue.Empty:
+                return None
+
+        with self._cond:
+            if not self._frames and not self.finished_reading:
+                self._cond.wait(timeout)
+            if not self._frames:
+                return None
+            frame = self._frames.pop()
+            self._frames.clear()
+            return frame
+
+    def exhausted(self):
+        """已读完且缓冲区为空"""
+        return self.finished_reading and not self._frames and self._queue.empty()
+
+    def stop(self):
+        self.running = False
+        self.wait()
+
+class VideoWorker(QThread):
+    """读帧/预处理 -> 推理 -> 解码绘制 三级流水线，各级由单线程执行器运行、有界队列相连"""
+    frame_ready = pyqtSignal()  # 有新帧可取，帧与统计信息通过 take_latest() 获取
+    detection_failed = pyqtSignal(str)  # 流水线出错，参数为错误信息
+    QUEUE_SIZE = 2  # 相邻流水线阶段之间的队列长度
+
+    def __init__(self, model, video_source=0, conf_threshold=0.3, batch_size=1, batch_timeout_ms=100,
+                 iou_threshold=0.7, max_det=300, device='cpu'):
+        super().__init__()
+        self.model = model
+        self.device = device
+        self.video_source = video_source
+        self.paced = not isinstance(video_source, int)  # 视频文件逐帧显示，摄像头只显示最新帧
+        self.conf_threshold = conf_threshold
+        self.iou_threshold = iou_threshold
+        self.max_det = max_det  # NMS 之后才截断，密集场景下不会在抑制前丢掉真实目标
+        self.batch_size = batch_size  # 每次推理的帧数，>1 时以延迟换吞吐
+        self.batch_timeout_ms = batch_timeout_ms  # 凑批等待上限，超时则以不满的批次推理
+        self.target_w = 0  # 显示宽度，绘制前将帧缩小到该宽度（0 表示不缩放），不影响模型输入
+        self.running = True
+        self.grabber = None
+        self._free_inputs = None  # 空闲的预分配输入张量 (batch, 3, H, W)，推理完成后归还复用
+        self._canvas = None  # 预分配的 letterbox 画布（仅预处理阶段使用）
+        self._latest_lock = QMutex()
+        self._latest = None  # 最新的 (帧, 统计信息)，界面来不及显示的旧帧直接覆盖
+        self._pending = False  # 已发出信号但界面尚未取走
+        self._taken = QWaitCondition()  # 界面取走帧时唤醒等待发布的绘制线程
+
+    def run(self):
+        try:
+            self.run_pipeline()
+        except Exception as e:
+            # QThread.run 中未捕获的异常会导致程序退出，转为信号交由界面处理
+            self.detection_failed.emit(str(e))
+
+    def run_pipeline(self):
+        self.grabber = FrameGrabber(self.video_source)
+        self.grabber.start()
+        executors = []
+        try:
+            self._start_and_join_stages(executors)
+        finally:
+            self.running = False
+            for ex in executors:
+                ex.shutdown()
+            self.grabber.stop()
+
+    def _start_and_join_stages(self, executors):
+        # 队列中、推理中、预处理中各需一份输入张量
+        self._free_inputs = queue.Queue()
+        for _ in range(self.QUEUE_SIZE + 2):
+            self._free_inputs.put(torch.empty((self.batch_size, 3, EXPORT_IMGSZ, EXPORT_IMGSZ),
+                                              dtype=torch.float32, device=self.device))
+        self._canvas = np.empty((EXPORT_IMGSZ, EXPORT_IMGSZ, 3), dtype=np.uint8)
+
+        to_infer = queue.Queue(maxsize=self.QUEUE_SIZE)
+        to_plot = queue.Queue(maxsize=self.QUEUE_SIZE)
+        stages = [
+            (self.read_worker, (to_infer,)),
+            (self.infer_worker, (to_infer, to_plot)),  # 模型只在此单线程阶段调用
+            (self.plot_emit_worker, (to_plot,)),
+        ]
+        executors.extend(ThreadPoolExecutor(max_workers=1) for _ in stages)
+        futures = [ex.submit(self._run_stage, func, *args) for ex, (func, args) in zip(executors, stages)]
+        for future in futures:
+            future.result()
+
+    def _run_stage(self, func, *args):
+        try:
+            func(*args)
+        except Exception:
+            # 任一阶段出错即停止整条流水线
+            self.running = False
+            raise
+
+    def _put(self, q, item):
+        """阻塞放入队列，停止检测时放弃并返回 False"""
+        while self.running:
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(self, q):
+        """阻塞取出队列元素，停止检测时返回 None"""
+        while self.running:
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return None
+
+    def read_worker(self, out_q):
+        """第一级：从读帧线程凑批并 letterbox 到空闲输入张量"""
+        timer = QElapsedTimer()
+        while self.running:
+            buf = []
+            timer.start()
+            while len(buf) < self.batch_size and not (buf and timer.hasExpired(self.batch_timeout_ms)):
+                frame = self.grabber.latest()
+                if frame is not None:
+                    buf.append(frame)  # 以原始分辨率 letterbox，小目标不受窗口大小影响
+                elif self.grabber.exhausted() or not self.running:
+                    break
+            if not buf:
+                if self.grabber.exhausted():
+                    break
+                continue
+
+            inputs = self._get(self._free_inputs)
+            if inputs is None:
+                break
+            with torch.inference_mode():
+                metas = self.preprocess(buf, inputs)
+            if not self._put(out_q, (buf, inputs, metas)):
+                break
+        self._put(out_q, None)
+
+    def infer_worker(self, in_q, out_q):
+        """第二级：调用推理后端，输出拷回 CPU 后立即归还输入张量"""
+        with torch.inference_mode():
+            backend = get_backend(self.model, self.device)
+            while True:
+                item = self._get(in_q)
+                if item is None:
+                    break
+                frames, inputs, metas = item
+                preds = backend(inputs[:len(frames)])
+                if isinstance(preds, (list, tuple)):
+                    preds = preds[0]
+                preds = preds.cpu().numpy()
+                self._free_inputs.put(inputs)
+                if not self._put(out_q, (frames, preds, metas)):
+                    break
+        self._put(out_q, None)
+
+    def plot_emit_worker(self, in_q):
+        """第三级：NMS 解码、绘制并发布到界面"""
+        while True:
+            item = self._get(in_q)
+            if item is None:
+                break
+            frames, preds, metas = item
+            if not self.paced:
+                # 实时源只需显示最新帧，批内更早的帧发布后会立即被覆盖，不必解码绘制
+                frames, preds, metas = frames[-1:], preds[-1:], metas[-1:]
+            for result in self.postprocess(frames, preds, metas):
+                annotated_frame = result.plot()
+                stats = self.extract_stats(result)
+                self.publish(annotated_frame, stats)
+
+    def publish(self, frame, stats):
+        """保存最新帧，仅在界面取走上一帧后才再次发信号，避免事件队列积压；
+        视频文件先等界面取走上一帧再发布，背压经有界队列传回读帧线程，保证每帧都显示"""
+        with QMutexLocker(self._latest_lock):
+            while self.paced and self._pending and self.running:
+                self._taken.wait(self._latest_lock, 100)
+            self._latest = (frame, stats)
+            if self._pending:
+                return
+            self._pending = True
+        self.frame_ready.emit()
+
+    def take_latest(self):
+        """取走最新的 (帧, 统计信息)，无新帧时返回 None"""
+        with QMutexLocker(self._latest_lock):
+            latest, self._latest = self._latest, None
+            self._pending = False
+            self._taken.wakeAll()
+        return latest
+
+    def preprocess(self, frames, inputs):
+        """自行 letterbox 并写入复用的输入张量，跳过 YOLO.__call__ 的重复预处理"""
+        metas = []
+        for i, frame in enumerate(frames):
+            metas.append(letterbox_into(frame, self._canvas))
+            cv2.cvtColor(self._canvas, cv2.COLOR_BGR2RGB, dst=self._canvas)
+            inputs[i].copy_(torch.from_numpy(self._canvas).permute(2, 0, 1))
+        inputs[:len(frames)].div_(255.0)
+        return metas
+
+    def postprocess(self, frames, preds, metas):
+        """解码原始输出并映射到缩小后的显示帧坐标，返回 ultralytics Results 列表"""
+        results = []
+        for frame, pred, (r, left, top) in zip(frames, preds, metas):
+            det = nms.decode_predictions(pred, self.conf_threshold, self.iou_threshold, self.max_det)
+            shown = self.fit_width(frame)
+            scale = shown.shape[1] / frame.shape[1]
+            det[:, [0, 2]] = ((det[:, [0, 2]] - left) / r * scale).clip(0, shown.shape[1])
+            det[:, [1, 3]] = ((det[:, [1, 3]] - top) / r * scale).clip(0, shown.shape[0])
+            results.append(Results(shown, path="", names=self.model.names, boxes=torch.from_numpy(det)))
+        return results
+
+    def fit_width(self, frame):
+        """按显示宽度缩小帧，使绘制与显示只处理所需像素"""
+        h, w = frame.shape[:2]
+        target_w = self.target_w
+        if 0 < target_w < w:
+            frame = resize(frame, (target_w, target_w * h // w), interpolation=cv2.INTER_LINEAR)
+        return frame
 
     def stop(self):
         self.running = False
         self.wait()
 
     def extract_stats(self, result):
-        counts = {}
-        total_conf = 0
-        for box in result.boxes:
-            cls = int(box.cls)
-            name = self.model.names[cls]
-            counts[name] = counts.get(name, 0) + 1
-            total_conf += float(box.conf)
-
-        avg_conf = total_conf / len(result.boxes) if result.boxes else 0
+        cls = result.boxes.cls.cpu().numpy().astype(np.int32)
+        conf = result.boxes.conf.cpu().numpy()
+        bins = np.bincount(cls, minlength=len(self.model.names))
+        counts = {self.model.names[i]: int(bins[i]) for i in np.flatnonzero(bins)}
+
+        avg_conf = float(conf.mean()) if conf.size else 0
         return {
-            "total_objects": sum(counts.values()),
+            "total_objects": int(cls.size),
             "class_distribution": counts,
             "avg_confidence": avg_conf,
             "fps": getattr(self, "fps", 0),
         }
 
+class EngineExporter(QThread):
+    """后台导出 TensorRT 引擎，避免阻塞界面"""
+    export_done = pyqtSignal(str)  # 导出成功，参数为引擎路径
+    export_failed = pyqtSignal(str)  # 导出失败，参数为错误信息
+
+    def __init__(self, pt_path, parent=None):
+        super().__init__(parent)
+        self.pt_path = pt_path
+
+    def run(self):
+        try:
+            self.export_done.emit(export_engine(self.pt_path))
+        except Exception as e:
+            self.export_failed.emit(str(e))
+
+class QuantizeWorker(QThread):
+    """后台读取校准帧、做 INT8 量化并加载预热量化模型，避免阻塞界面"""
+    quantize_done = pyqtSignal(str, object)  # 量化成功，参数为量化模型目录与已预热的 CPU 模型
+    quantize_failed = pyqtSignal(str)  # 量化失败，参数为错误信息
+
+    def __init__(self, pt_path, video_source, parent=None):
+        super().__init__(parent)
+        self.pt_path = pt_path
+        self.video_source = video_source
+
+    def run(self):
+        try:
+            calib_frames = collect_calib_frames(self.video_source)
+            if not calib_frames:
+                raise RuntimeError("未能从输入源读取校准帧")
+            int8_dir = quantize_model(openvino_dir_for(self.pt_path), int8_dir_for(self.pt_path), calib_frames)
+            model = load_optimized_model(self.pt_path, 'cpu')
+            warmup_model(model, 'cpu')
+            self.quantize_done.emit(int8_dir, model)
+        except Exception as e:
+            self.quantize_failed.emit(str(e))
+
+# 按钮样式（明暗主题共用）
+BUTTON_STYLE = """
+    QPushButton[btnType="primary"], QPushButton[btnType="secondary"],
+    QPushButton[btnType="danger"], QPushButton[btnType="success"] {
+        color: white;
+        border: none;
+        padding: 8px;
+        border-radius: 6px;
+        font-size: 14px;
+    }
+    QPushButton[btnType="primary"] { background-color: #007acc; }
+    QPushButton[btnType="primary"]:hover { background-color: #005fa3; }
+    QPushButton[btnType="secondary"] { background-color: #444444; }
+    QPushButton[btnType="secondary"]:hover { background-color: #666666; }
+    QPushButton[btnType="danger"] { background-color: #e63946; }
+    QPushButton[btnType="danger"]:hover { background-color: #b52e31; }
+    QPushButton[btnType="success"] { background-color: #28a745; }
+    QPushButton[btnType="success"]:hover { background-color: #1e7e34; }
+"""
+
+# 面板、卡片、下拉框与图像区在两种主题下保持原有的深色配色，主题只切换窗口背景与文字颜色
+WIDGET_STYLE = """
+    QWidget#controlPanel {
+        background-color: #2d2d2d;
+        border-radius: 10px;
+        padding: 15px;
+    }
+    QFrame#card {
+        background-color: #3a3a3a;
+        border-radius: 8px;
+        padding: 10px;
+        margin-bottom: 10px;
+    }
+    QFrame#statsCard {
+        background-color: #3a3a3a;
+        border-radius: 8px;
+        padding: 15px;
+        margin-top: 10px;
+    }
+    QLabel#cardTitle {
+        font-weight: bold;
+        font-size: 16px;
+        margin-bottom: 5px;
+    }
+    QFrame#statsCard QLabel#cardTitle {
+        font-size: 18px;
+        margin-bottom: 10px;
+    }
+    QLabel#statsText {
+        font-size: 14px;
+    }
+    QLabel#imageLabel {
+        background-color: #1e1e1e;
+        border-radius: 10px;
+    }
+    QComboBox {
+        padding: 6px;
+        border: 1px solid #555;
+        border-radius: 4px;
+        background-color: #444;
+        color: white;
+        font-size: 14px;
+    }
+    QComboBox::drop-down {
+        border: 0px;
+    }
+"""
+
+STYLE_DARK = """
+    QMainWindow {
+        background-color: #1e1e1e;
+        color: white;
+    }
+    QLabel {
+        color: white;
+    }
+    QComboBox, QSlider, QPushButton {
+        border: 1px solid #555;
+        padding: 6px;
+    }
+""" + WIDGET_STYLE + BUTTON_STYLE
+
+STYLE_LIGHT = """
+    QMainWindow {
+        background-color: #f0f0f0;
+        color: black;
+    }
+    QLabel {
+        color: black;
+    }
+    QComboBox, QSlider, QPushButton {
+        border: 1px solid #ccc;
+        padding: 6px;
+    }
+""" + WIDGET_STYLE + BUTTON_STYLE
+
+# 视频文件检测时的批大小（摄像头保持逐帧以降低延迟）
+VIDEO_BATCH_SIZE = 8
+
 class YOLODetector(QMainWindow):
     def __init__(self):
         super().__init__()
@@ -71,7 +459,17 @@ class YOLODetector(QMainWindow):
         self.model_path = ""
         self.save_dir = "results"
         self.worker = None
+        self.exporter = None  # 后台 TensorRT 导出线程
+        self.quantizer = None  # 后台 INT8 量化线程
+        self._pending_launch = None  # 量化完成后待启动的 (视频源, 批大小)
+        self.device = default_device()  # 有 CUDA 时默认使用 GPU
+        self.model_device = None  # 当前 self.model 加载时所用的设备
+        self.last_image = None  # 最近一帧检测结果（BGR，仅保存引用）
+        self._pending_stats = None  # 等待刷新到界面的最新统计
+        self._last_stats_key = None  # 上次显示的统计内容，用于跳过重复刷新
         self.dark_theme = True  # 默认暗黑模式
+        self._rgb_buf = None  # 复用的 RGB 转换缓冲区（仅无 BGR888 时使用）
+        self._smooth_scale = False  # 仅单张图片使用平滑缩放，视频帧使用快速缩放
 
         self.init_ui()
         self.init_status_bar()
@@ -92,11 +490,14 @@ class YOLODetector(QMainWindow):
         self.image_scroll = QScrollArea()
         self.image_label = QLabel("等待检测...")
         self.image_label.setAlignment(Qt.AlignCenter)
-        self.image_label.setStyleSheet("background-color: #1e1e1e; border-radius: 10px;")
+        self.image_label.setObjectName("imageLabel")
         self.image_label.setSizePolicy(QSizePolicy.Ignored, QSizePolicy.Ignored)
+        self.image_label.setScaledContents(False)  # 缩放在 display_image 中按需完成
         self.image_scroll.setWidget(self.image_label)
         self.image_scroll.setWidgetResizable(True)
         right_layout.addWidget(self.image_scroll)
+        # 视口尺寸在布局生效后才确定，监听其 Resize 事件同步给检测线程
+        self.image_scroll.viewport().installEventFilter(self)
 
         # 检测统计信息区
         self.stats_card = self.create_stats_card()
@@ -111,25 +512,7 @@ class YOLODetector(QMainWindow):
     def create_stats_card(self):
         """创建检测统计信息卡片"""
         card = QFrame()
-        card.setObjectName("card")
-        card.setStyleSheet("""
-            QFrame#card {
-                background-color: #3a3a3a;
-                border-radius: 8px;
-                padding: 15px;
-                margin-top: 10px;
-            }
-            QLabel.cardTitle {
-                color: #ffffff;
-                font-weight: bold;
-                font-size: 18px;
-                margin-bottom: 10px;
-            }
-            QLabel.statsText {
-                font-size: 14px;
-                line-height: 1.5;
-            }
-        """)
+        card.setObjectName("statsCard")
         layout = QVBoxLayout()
         layout.addWidget(self.create_label("检测统计", "cardTitle"))
 
@@ -142,38 +525,47 @@ class YOLODetector(QMainWindow):
     def create_control_panel(self):
         panel = QWidget()
         panel.setObjectName("controlPanel")
-        panel.setStyleSheet("""
-            QWidget#controlPanel {
-                background-color: #2d2d2d;
-                border-radius: 10px;
-                padding: 15px;
-            }
-        """)
         layout = QVBoxLayout()
 
         # 模型加载卡片
+        self.model_label = self.create_label("当前模型: 未加载", "modelLabel")
+        self.load_btn = self.create_button("📁 加载YOLO模型", self.load_model, "primary", "modelBtn")
         model_card = self.create_card("模型设置", [
-            self.create_label("当前模型: 未加载", "modelLabel"),
-            self.create_button("📁 加载YOLO模型", self.load_model, "primary", "modelBtn")
+            self.model_label,
+            self.load_btn
         ])
         layout.addWidget(model_card)
 
         # 输入源卡片
+        self.input_combo = self.create_combo_box(["📸 摄像头", "🎞️ 视频文件", "🖼️ 图片文件"], "inputCombo")
         input_card = self.create_card("输入源设置", [
             self.create_label("输入源选择:"),
-            self.create_combo_box(["📸 摄像头", "🎞️ 视频文件", "🖼️ 图片文件"], "inputCombo"),
+            self.input_combo,
             self.create_button("📂 选择文件", self.select_input_file, "secondary", "fileBtn")
         ])
         layout.addWidget(input_card)
 
         # 控制面板卡片
+        self.start_btn = self.create_button("▶ 开始检测", self.start_detection, "primary", "startBtn")
+        self.stop_btn = self.create_button("⏹ 停止检测", self.stop_detection, "danger", "stopBtn")
         control_card = self.create_card("控制面板", [
-            self.create_button("▶ 开始检测", self.start_detection, "primary", "startBtn"),
-            self.create_button("⏹ 停止检测", self.stop_detection, "danger", "stopBtn"),
+            self.start_btn,
+            self.stop_btn,
             self.create_button("💾 保存结果", self.save_result, "success", "saveBtn")
         ])
         layout.addWidget(control_card)
 
+        # 推理设备卡片
+        self.device_combo = self.create_combo_box(["🖥️ CPU", "⚡ GPU (CUDA)"], "deviceCombo")
+        self.device_combo.setCurrentIndex(0 if self.device == 'cpu' else 1)
+        self.device_combo.setEnabled(torch.cuda.is_available())
+        self.device_combo.currentIndexChanged.connect(self.change_device)
+        device_card = self.create_card("推理设备", [
+            self.create_label("推理设备选择:"),
+            self.device_combo
+        ])
+        layout.addWidget(device_card)
+
         # 主题设置卡片
         theme_card = self.create_card("主题设置", [
             self.create_label("界面主题"),
@@ -188,20 +580,6 @@ class YOLODetector(QMainWindow):
     def create_card(self, title, widgets):
         card = QFrame()
         card.setObjectName("card")
-        card.setStyleSheet("""
-            QFrame#card {
-                background-color: #3a3a3a;
-                border-radius: 8px;
-                padding: 10px;
-                margin-bottom: 10px;
-            }
-            QLabel.cardTitle {
-                color: #ffffff;
-                font-weight: bold;
-                font-size: 16px;
-                margin-bottom: 5px;
-            }
-        """)
         layout = QVBoxLayout()
         layout.addWidget(self.create_label(title, "cardTitle"))
         for widget in widgets:
@@ -219,61 +597,7 @@ class YOLODetector(QMainWindow):
         btn = QPushButton(text)
         if obj_name:
             btn.setObjectName(obj_name)
-        style_map = {
-            "primary": """
-                QPushButton {
-                    background-color: #007acc;
-                    color: white;
-                    border: none;
-                    padding: 8px;
-                    border-radius: 6px;
-                    font-size: 14px;
-                }
-                QPushButton:hover {
-                    background-color: #005fa3;
-                }
-            """,
-            "secondary": """
-                QPushButton {
-                    background-color: #444444;
-                    color: white;
-                    border: none;
-                    padding: 8px;
-                    border-radius: 6px;
-                    font-size: 14px;
-                }
-                QPushButton:hover {
-                    background-color: #666666;
-                }
-            """,
-            "danger": """
-                QPushButton {
-                    background-color: #e63946;
-                    color: white;
-                    border: none;
-                    padding: 8px;
-                    border-radius: 6px;
-                    font-size: 14px;
-                }
-                QPushButton:hover {
-                    background-color: #b52e31;
-                }
-            """,
-            "success": """
-                QPushButton {
-                    background-color: #28a745;
-                    color: white;
-                    border: none;
-                    padding: 8px;
-                    border-radius: 6px;
-                    font-size: 14px;
-                }
-                QPushButton:hover {
-                    background-color: #1e7e34;
-                }
-            """
-        }
-        btn.setStyleSheet(style_map.get(btn_type, ""))
+        btn.setProperty("btnType", btn_type)  # 由窗口级样式表按类型匹配
         btn.clicked.connect(func)
         return btn
 
@@ -283,19 +607,6 @@ class YOLODetector(QMainWindow):
         combo.addItems(items)
         if func:
             combo.currentIndexChanged.connect(func)
-        combo.setStyleSheet("""
-            QComboBox {
-                padding: 6px;
-                border: 1px solid #555;
-                border-radius: 4px;
-                background-color: #444;
-                color: white;
-                font-size: 14px;
-            }
-            QComboBox::drop-down {
-                border: 0px;
-            }
-        """)
         return combo
 
     def init_status_bar(self):
@@ -322,14 +633,21 @@ class YOLODetector(QMainWindow):
             self.progress_bar.show()
             self.status_label.setText("正在加载模型...")
 
-            # 强制使用 CPU
-            self.model = YOLO(file_name).to('cpu')
+            with self.controls_locked():
+                # CPU 使用 OpenVINO 导出模型，GPU 优先使用 TensorRT 引擎（导出结果缓存于权重同目录）
+                model = load_optimized_model(file_name, self.device)
+                self.status_label.setText("正在预热模型...")
+                warmup_model(model, self.device, on_step=QApplication.processEvents)
 
+            # 预热完成后再整体替换，期间的界面操作看到的始终是一致的旧状态
+            self.model = model
+            self.model_device = self.device
             self.model_path = file_name
-            self.findChild(QLabel, "modelLabel").setText(f"当前模型: {os.path.basename(file_name)}")
+            self.model_label.setText(f"当前模型: {os.path.basename(file_name)}")
 
             self.status_label.setText("模型加载成功")
             self.progress_bar.hide()
+            self.start_engine_export()
             self.show_message("成功", "模型加载完成", is_error=False)
 
         except FileNotFoundError:
@@ -344,13 +662,90 @@ class YOLODetector(QMainWindow):
             detailed_msg = f"加载模型时发生错误:\n\n{error_msg}\n\n请检查以下内容:\n1. 是否是有效的 YOLOv8 模型文件(.pt)\n2. 是否为最新 ultralytics 版本\n3. 是否缺少依赖库"
             self.show_message("加载失败", detailed_msg, is_error=True)
 
+    def start_engine_export(self):
+        """GPU 模式下若尚无 TensorRT 引擎，则在后台导出一次，完成后自动切换"""
+        if self.device == 'cpu' or self.exporter or os.path.isfile(engine_path_for(self.model_path)):
+            return
+        self.exporter = EngineExporter(self.model_path, self)
+        self.exporter.export_done.connect(self.on_engine_exported)
+        self.exporter.export_failed.connect(self.on_engine_export_failed)
+        # 线程真正结束后才释放引用并销毁，避免销毁仍在运行的 QThread
+        self.exporter.finished.connect(self.on_exporter_finished)
+        self.exporter.finished.connect(self.exporter.deleteLater)
+        self.exporter.start()
+        self.status_label.setText("正在后台导出 TensorRT 引擎...")
+
+    def on_engine_exported(self, engine_path):
+        pt_path = self.exporter.pt_path
+        if self.device == 'cpu' or self.worker or pt_path != self.model_path:
+            # 检测进行中或已切换模型/设备时，下次加载再使用引擎
+            return
+        try:
+            with self.controls_locked():
+                model = load_optimized_model(self.model_path, self.device)
+                warmup_model(model, self.device, on_step=QApplication.processEvents)
+        except Exception:
+            # 引擎与运行时不匹配或显存不足时保留当前模型
+            self.status_label.setText("TensorRT 引擎加载失败，继续使用 PyTorch GPU 推理")
+            return
+        self.model = model
+        self.status_label.setText(f"已切换到 TensorRT 引擎: {os.path.basename(engine_path)}")
+
+    def on_engine_export_failed(self, error_msg):
+        self.status_label.setText("TensorRT 导出失败，继续使用 PyTorch GPU 推理")
+
+    def on_exporter_finished(self):
+        # finished 在线程退出前发出，先等线程完全结束；对象本身由 deleteLater 销毁
+        self.exporter.wait()
+        self.exporter = None
+
+    def change_device(self, index):
+        # 检测进行中时设备选择框被禁用，这里总能立即按新设备重新加载模型
+        self.device = 'cpu' if index == 0 else 'cuda'
+        if self.model_path:
+            self.reload_model()
+
+    def reload_model(self):
+        """按 self.device 重新加载当前模型，失败时恢复到原设备"""
+        self.progress_bar.show()
+        self.status_label.setText("正在切换推理设备...")
+        try:
+            with self.controls_locked():
+                QApplication.processEvents()
+                model = load_optimized_model(self.model_path, self.device)
+                warmup_model(model, self.device, on_step=QApplication.processEvents)
+            self.model = model
+            self.model_device = self.device
+            self.status_label.setText(f"推理设备: {self.device.upper()}")
+            self.start_engine_export()
+        except Exception as e:
+            self.device = self.model_device
+            self.device_combo.blockSignals(True)
+            self.device_combo.setCurrentIndex(0 if self.device == 'cpu' else 1)
+            self.device_combo.blockSignals(False)
+            self.status_label.setText("切换推理设备失败")
+            self.show_message("错误", f"切换推理设备失败:\n\n{e}", is_error=True)
+        self.progress_bar.hide()
+
+    @contextmanager
+    def controls_locked(self):
+        """模型加载/预热期间会处理界面事件，暂时禁用控制按钮以防重入，结束后恢复原状态"""
+        widgets = [self.load_btn, self.start_btn, self.stop_btn, self.device_combo]
+        states = [w.isEnabled() for w in widgets]
+        for w in widgets:
+            w.setEnabled(False)
+        try:
+            yield
+        finally:
+            for w, enabled in zip(widgets, states):
+                w.setEnabled(enabled)
+
     def select_input_file(self):
-        input_combo = self.findChild(QComboBox, "inputCombo")
-        if input_combo.currentIndex() == 1:
+        if self.input_combo.currentIndex() == 1:
             self.file_path, _ = QFileDialog.getOpenFileName(
                 self, "选择视频文件", "", "视频文件 (*.mp4 *.avi)"
             )
-        elif input_combo.currentIndex() == 2:
+        elif self.input_combo.currentIndex() == 2:
             self.file_path, _ = QFileDialog.getOpenFileName(
                 self, "选择图片文件", "", "图片文件 (*.png *.jpg *.bmp)"
             )
@@ -360,63 +755,190 @@ class YOLODetector(QMainWindow):
             self.show_message("警告", "请先加载模型！", is_error=True)
             return
 
-        source_type = self.findChild(QComboBox, "inputCombo").currentIndex()
+        source_type = self.input_combo.currentIndex()
         if source_type == 2:
             self.process_single_image()
             return
 
-        self.findChild(QPushButton, "startBtn").setEnabled(False)
-        self.findChild(QPushButton, "stopBtn").setEnabled(True)
+        if self.model_device != self.device:
+            self.reload_model()
 
-        self.status_label.setText("检测进行中")
+        self.start_btn.setEnabled(False)
+        self.stop_btn.setEnabled(True)
+        self.device_combo.setEnabled(False)  # 检测中不允许切换设备，模型与输入张量须在同一设备
+        self._smooth_scale = False
 
         video_source = 0 if source_type == 0 else self.file_path
-        self.worker = VideoWorker(self.model, video_source, conf_threshold=0.3)
-        self.worker.frame_ready.connect(self.display_image_and_stats)
+        batch_size = 1 if source_type == 0 else VIDEO_BATCH_SIZE
+        if self.start_quantization(video_source):
+            # 量化完成（或失败）后再启动检测
+            self._pending_launch = (video_source, batch_size)
+            return
+        self.launch_worker(video_source, batch_size)
+
+    def launch_worker(self, video_source, batch_size, status="检测进行中"):
+        self.status_label.setText(status)
+        self.worker = VideoWorker(self.model, video_source, conf_threshold=0.3, batch_size=batch_size,
+                                  device=self.device)
+        self.worker.target_w = self.display_width()
+        self.worker.frame_ready.connect(self.on_frame_ready)
+        self.worker.detection_failed.connect(self.on_detection_failed)
+        self.worker.finished.connect(self.on_worker_finished)
         self.worker.start()
 
+    def start_quantization(self, video_source):
+        """首次检测视频源时，在后台用其前若干帧校准生成 INT8 模型；已开始量化返回 True"""
+        if self.quantizer:
+            return True  # 上一次量化仍在进行，完成后启动本次检测
+        if (self.device != 'cpu' or os.path.isdir(int8_dir_for(self.model_path))
+                or not os.path.isdir(openvino_dir_for(self.model_path))):
+            return False
+
+        self.quantizer = QuantizeWorker(self.model_path, video_source, self)
+        self.quantizer.quantize_done.connect(self.on_quantized)
+        self.quantizer.quantize_failed.connect(self.on_quantize_failed)
+        self.quantizer.finished.connect(self.on_quantizer_finished)
+        self.quantizer.finished.connect(self.quantizer.deleteLater)
+        self.quantizer.start()
+        self.progress_bar.show()
+        self.status_label.setText("正在进行 INT8 量化...")
+        return True
+
+    def on_quantized(self, int8_dir, model):
+        # 量化期间可能已停止检测并切换设备或模型，此时保留当前模型，下次在 CPU 上加载时再使用
+        if self.device == 'cpu' and self.model_device == 'cpu' and int8_dir == int8_dir_for(self.model_path):
+            self.model = model
+        self.launch_pending("检测进行中")
+
+    def on_quantize_failed(self, error_msg):
+        self.launch_pending(f"检测进行中（INT8 量化失败，使用 FP32 模型: {error_msg}）",
+                            f"INT8 量化失败，继续使用 FP32 模型: {error_msg}")
+
+    def launch_pending(self, status, idle_status="INT8 量化完成"):
+        """量化结束后启动等待中的检测；检测已被取消时只更新状态栏"""
+        self.progress_bar.hide()
+        pending, self._pending_launch = self._pending_launch, None
+        if pending:
+            self.launch_worker(*pending, status=status)
+        else:
+            self.status_label.setText(idle_status)
+
+    def on_quantizer_finished(self):
+        # finished 在线程退出前发出，先等线程完全结束；对象本身由 deleteLater 销毁
+        self.quantizer.wait()
+        self.quantizer = None
+
     def process_single_image(self):
         if not hasattr(self, "file_path") or not os.path.exists(self.file_path):
             self.show_message("警告", "请选择有效的图片文件！", is_error=True)
             return
 
-        img = cv2.imread(self.file_path)
-        results = self.model(img, conf=0.3)
+        img = read_image(self.file_path)
+        with torch.inference_mode():
+            results = self.model(img, conf=0.3, device=self.device)
         annotated_img = results[0].plot()
+        self._smooth_scale = True
         self.display_image(annotated_img)
         self.update_stats(results[0])
 
+    def on_worker_finished(self):
+        """视频播放结束或出错退出时复位界面；手动停止时 self.worker 已清空，直接忽略"""
+        if self.worker is None or self.sender() is not self.worker:
+            return
+        self.worker.wait()  # finished 在线程退出前发出，等线程完全结束再释放
+        self.worker = None
+        self.reset_controls()
+        if self.status_label.text().startswith("检测进行中"):
+            self.status_label.setText("检测结束")
+
+    def on_detection_failed(self, error_msg):
+        self.status_label.setText("检测出错")
+        self.show_message("检测出错", f"检测过程中发生错误:\n\n{error_msg}", is_error=True)
+
+    def on_frame_ready(self):
+        latest = self.worker.take_latest() if self.worker else None
+        if latest is not None:
+            self.display_image_and_stats(*latest)
+
     def display_image_and_stats(self, frame, stats):
         self.display_image(frame)
         self.update_stats(stats)
 
+    def display_width(self):
+        return self.image_scroll.width() - 20
+
+    def eventFilter(self, obj, event):
+        if event.type() == QEvent.Resize and obj is self.image_scroll.viewport() and self.worker:
+            self.worker.target_w = self.display_width()
+        return super().eventFilter(obj, event)
+
     def display_image(self, img):
-        img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-        h, w, ch = img.shape
-        bytes_per_line = ch * w
-        qt_image = QImage(img.data, w, h, bytes_per_line, QImage.Format_RGB888)
-        self.image_label.setPixmap(QPixmap.fromImage(qt_image).scaledToWidth(
-            self.image_scroll.width() - 20,
-            Qt.SmoothTransformation
-        ))
+        self.last_image = img
+        target_w = self.display_width()
+        if img.shape[1] > target_w > 0:
+            # 先缩小再转色，减少 cvtColor 处理的像素数
+            img = resize(img, (target_w, img.shape[0] * target_w // img.shape[1]),
+                         interpolation=cv2.INTER_AREA)
+        if HAS_BGR888:
+            # Qt 直接读取 OpenCV 的 BGR 排列，无需转色
+            if not img.flags['C_CONTIGUOUS']:
+                img = np.ascontiguousarray(img)
+            fmt = QImage.Format_BGR888
+        else:
+            if self._rgb_buf is None or self._rgb_buf.shape != img.shape:
+                self._rgb_buf = np.empty_like(img)
+            img = bgr_to_rgb(img, dst=self._rgb_buf)
+            fmt = QImage.Format_RGB888
+
+        h, w, _ = img.shape
+        qt_image = QImage(img.data, w, h, img.strides[0], fmt)
+        pixmap = QPixmap.fromImage(qt_image)  # fromImage 会复制像素，缓冲区可安全复用
+        if w != target_w:
+            # 视频帧已接近目标宽度，快速缩放即可；单张图片保留平滑缩放
+            mode = Qt.SmoothTransformation if self._smooth_scale else Qt.FastTransformation
+            pixmap = pixmap.scaledToWidth(target_w, mode)
+        self.image_label.setPixmap(pixmap)
 
     def update_stats(self, stats):
         if isinstance(stats, dict):
-            stats_text = f"当前帧检测到: {stats.get('total_objects', 0)} 个对象\n\n"
-            stats_text += "类别分布:\n" + "\n".join([f"  • {k}: {v} 个" for k, v in stats.get('class_distribution', {}).items()])
-            stats_text += f"\n\n平均置信度: {stats.get('avg_confidence', 0):.2f}"
-            self.stats_text.setText(stats_text)
+            # 合并 200ms 内的统计更新，只显示最新一次
+            if self._pending_stats is None:
+                QTimer.singleShot(200, self._flush_stats)
+            self._pending_stats = stats
+
+    def _flush_stats(self):
+        stats, self._pending_stats = self._pending_stats, None
+        if stats is None:
+            return
+        key = (
+            stats.get('total_objects', 0),
+            tuple(sorted(stats.get('class_distribution', {}).items())),
+            round(stats.get('avg_confidence', 0), 2),
+        )
+        if key == self._last_stats_key:
+            return
+        self._last_stats_key = key
+
+        stats_text = f"当前帧检测到: {stats.get('total_objects', 0)} 个对象\n\n"
+        stats_text += "类别分布:\n" + "\n".join([f"  • {k}: {v} 个" for k, v in stats.get('class_distribution', {}).items()])
+        stats_text += f"\n\n平均置信度: {stats.get('avg_confidence', 0):.2f}"
+        self.stats_text.setText(stats_text)
 
     def stop_detection(self):
+        self._pending_launch = None  # 量化尚未完成时取消随后的检测
         if self.worker:
             self.worker.stop()
             self.worker = None
-        self.findChild(QPushButton, "startBtn").setEnabled(True)
-        self.findChild(QPushButton, "stopBtn").setEnabled(False)
+        self.reset_controls()
         self.status_label.setText("已停止检测")
 
+    def reset_controls(self):
+        self.start_btn.setEnabled(True)
+        self.stop_btn.setEnabled(False)
+        self.device_combo.setEnabled(torch.cuda.is_available())
+
     def save_result(self):
-        if not hasattr(self, "last_image"):
+        if self.last_image is None:
             self.show_message("警告", "没有可保存的结果！", is_error=True)
             return
 
@@ -427,7 +949,13 @@ class YOLODetector(QMainWindow):
             self, "保存检测结果", os.path.join(self.save_dir, "result.jpg"), "图像 (*.jpg)"
         )
         if file_name:
-            cv2.imwrite(file_name, self.last_image)
+            # 保存时才编码，一次性写入文件（也避免 imwrite 不支持中文路径）
+            ok, encoded = cv2.imencode('.jpg', self.last_image, [cv2.IMWRITE_JPEG_QUALITY, 90])
+            if not ok:
+                self.show_message("错误", "图像编码失败！", is_error=True)
+                return
+            with open(file_name, 'wb') as f:
+                f.write(encoded.tobytes())
             self.show_message("保存成功", f"结果已保存至: {file_name}")
 
     def change_theme(self, index):
@@ -436,34 +964,8 @@ class YOLODetector(QMainWindow):
         self.show_message("主题已切换", f"当前主题: {'暗黑' if index == 0 else '亮白'}")
 
     def apply_theme(self):
-        if self.dark_theme:
-            self.setStyleSheet("""
-                QMainWindow {
-                    background-color: #1e1e1e;
-                    color: white;
-                }
-                QLabel {
-                    color: white;
-                }
-                QComboBox, QSlider, QPushButton {
-                    border: 1px solid #555;
-                    padding: 6px;
-                }
-            """)
-        else:
-            self.setStyleSheet("""
-                QMainWindow {
-                    background-color: #f0f0f0;
-                    color: black;
-                }
-                QLabel {
-                    color: black;
-                }
-                QComboBox, QSlider, QPushButton {
-                    border: 1px solid #ccc;
-                    padding: 6px;
-                }
-            """)
+        # 整个窗口只设置一次样式表，子控件通过 objectName / btnType 属性匹配
+        self.setStyleSheet(STYLE_DARK if self.dark_theme else STYLE_LIGHT)
 
     def show_message(self, title, content, is_error=False):
         if is_error:
@@ -472,11 +974,30 @@ class YOLODetector(QMainWindow):
             QMessageBox.information(self, title, content)
 
     def closeEvent(self, event):
+        busy = [t for t in (self.exporter, self.quantizer) if t and t.isRunning()]
+        if busy:
+            # TensorRT 导出与 INT8 量化无法中断，只能等待完成后再退出
+            reply = QMessageBox.question(
+                self, "后台任务进行中", "TensorRT 导出或 INT8 量化仍在后台进行，退出前需等待其完成。\n\n是否等待完成后退出？",
+                QMessageBox.Yes | QMessageBox.No, QMessageBox.No
+            )
+            if reply != QMessageBox.Yes:
+                event.ignore()
+                return
+            self.status_label.setText("正在等待后台任务完成...")
+            QApplication.setOverrideCursor(Qt.WaitCursor)
+            for t in busy:
+                t.wait()
+            QApplication.restoreOverrideCursor()
+            self._pending_launch = None
         if self.worker:
             self.worker.stop()
         event.accept()
 
 if __name__ == "__main__":
+    configure_torch()
+    configure_opencv()
+    nms.warmup()
     app = QApplication(sys.argv)
     app.setFont(QFont("微软雅黑", 10))
     window = YOLODetector()
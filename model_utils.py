@@ -0,0 +1,199 @@
+import os
+import shutil
+
+import cv2
+import numpy as np
+import torch
+from ultralytics import YOLO
+
+# 导出模型的输入尺寸
+EXPORT_IMGSZ = 640
+# INT8 量化使用的校准帧数
+CALIB_FRAMES = 100
+# TensorRT 引擎支持的最大 batch
+ENGINE_MAX_BATCH = 8
+
+
+def default_device():
+    """有 NVIDIA GPU 时默认使用 CUDA"""
+    return 'cuda' if torch.cuda.is_available() else 'cpu'
+
+
+def openvino_dir_for(pt_path):
+    """返回与 .pt 权重同目录的 OpenVINO 导出目录路径"""
+    return os.path.splitext(pt_path)[0] + "_openvino_model"
+
+
+def int8_dir_for(pt_path):
+    """返回与 .pt 权重同目录的 INT8 量化模型目录路径"""
+    return os.path.splitext(pt_path)[0] + "_int8_openvino_model"
+
+
+def engine_path_for(pt_path):
+    """返回与 .pt 权重同目录的 TensorRT 引擎路径"""
+    return os.path.splitext(pt_path)[0] + ".engine"
+
+
+def export_engine(pt_path):
+    """将 .pt 权重导出为 TensorRT FP16 引擎（耗时较长，应在后台线程调用）"""
+    return YOLO(pt_path).export(format="engine", half=True, imgsz=EXPORT_IMGSZ,
+                                dynamic=True, batch=ENGINE_MAX_BATCH, device=0)
+
+
+def export_openvino(pt_path):
+    """将 .pt 权重导出为 OpenVINO IR，已导出过则直接复用缓存目录"""
+    ir_dir = openvino_dir_for(pt_path)
+    if os.path.isdir(ir_dir):
+        return ir_dir
+    # 动态 batch 维度，便于视频帧批量推理
+    return YOLO(pt_path).export(format="openvino", imgsz=EXPORT_IMGSZ, half=False, dynamic=True)
+
+
+def load_optimized_model(pt_path, device='cpu'):
+    """加载加速模型。GPU：优先 TensorRT 引擎，否则 PyTorch；
+    CPU：优先 INT8 量化模型，其次 OpenVINO FP32，导出失败时回退到 PyTorch"""
+    if device != 'cpu':
+        if os.path.isfile(engine_path_for(pt_path)):
+            return YOLO(engine_path_for(pt_path), task="detect")
+        return fused_torch_model(pt_path)
+
+    if os.path.isdir(int8_dir_for(pt_path)):
+        return YOLO(int8_dir_for(pt_path), task="detect")
+    try:
+        return YOLO(export_openvino(pt_path), task="detect")
+    except Exception:
+        return fused_torch_model(pt_path)
+
+
+def fused_torch_model(pt_path):
+    """加载 PyTorch 模型，融合 conv+bn 并切换到推理模式（设备在推理时指定）"""
+    model = YOLO(pt_path)
+    model.fuse()
+    model.model.eval()
+    return model
+
+
+def warmup_model(model, device='cpu', runs=2, on_step=None):
+    """用空白图做几次前向推理，提前完成内核选择与内存池分配，消除首帧卡顿"""
+    dummy = np.zeros((EXPORT_IMGSZ, EXPORT_IMGSZ, 3), dtype=np.uint8)
+    with torch.inference_mode():
+        for _ in range(runs):
+            model(dummy, conf=0.5, device=device, verbose=False)
+            if on_step:
+                on_step()
+
+
+def configure_torch():
+    """程序启动时设置 PyTorch 线程数，避免超额订阅；
+    梯度模式是线程局部的，由各推理调用处的 torch.inference_mode() 关闭"""
+    torch.set_num_threads(os.cpu_count() // 2 or 1)
+
+
+def configure_opencv():
+    """启用 OpenCV 的 T-API：有 OpenCL 设备时 resize/cvtColor 交由集成显卡执行"""
+    cv2.ocl.setUseOpenCL(cv2.ocl.haveOpenCL())
+
+
+def resize(img, size, interpolation=cv2.INTER_LINEAR):
+    """缩放图像，OpenCL 可用时通过 UMat 在 GPU 上执行"""
+    if cv2.ocl.useOpenCL():
+        return cv2.resize(cv2.UMat(img), size, interpolation=interpolation).get()
+    return cv2.resize(img, size, interpolation=interpolation)
+
+
+def bgr_to_rgb(img, dst=None):
+    """BGR 转 RGB，OpenCL 可用时通过 UMat 在 GPU 上执行，否则写入 dst 缓冲区"""
+    if cv2.ocl.useOpenCL():
+        return cv2.cvtColor(cv2.UMat(img), cv2.COLOR_BGR2RGB).get()
+    return cv2.cvtColor(img, cv2.COLOR_BGR2RGB, dst=dst)
+
+
+def read_image(path):
+    """读取图片（imdecode 可处理 Windows 中文路径）"""
+    return cv2.imdecode(np.fromfile(path, dtype=np.uint8), cv2.IMREAD_COLOR)
+
+
+def letterbox_into(img, canvas):
+    """将 img 等比缩放后居中写入预分配的 canvas（灰边填充），返回缩放比与左、上偏移"""
+    size = canvas.shape[0]
+    h, w = img.shape[:2]
+    r = min(size / h, size / w)
+    nw, nh = int(round(w * r)), int(round(h * r))
+    top, left = (size - nh) // 2, (size - nw) // 2
+    canvas[:] = 114
+    canvas[top:top + nh, left:left + nw] = cv2.resize(img, (nw, nh), interpolation=cv2.INTER_LINEAR)
+    return r, left, top
+
+
+def letterbox(img, size=EXPORT_IMGSZ):
+    """等比缩放并以灰边填充为 size x size"""
+    canvas = np.empty((size, size, 3), dtype=np.uint8)
+    letterbox_into(img, canvas)
+    return canvas
+
+
+def preprocess_frame(frame):
+    """已 letterbox 的 BGR 帧 -> 模型输入 (1, 3, H, W) float32"""
+    img = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+    return np.ascontiguousarray(img.transpose(2, 0, 1))[None].astype(np.float32) / 255.0
+
+
+def get_backend(model, device='cpu'):
+    """返回 YOLO 内部的推理后端（AutoBackend），可直接接收预处理好的 BCHW 张量"""
+    if model.predictor is None:
+        model(np.zeros((EXPORT_IMGSZ, EXPORT_IMGSZ, 3), dtype=np.uint8), device=device, verbose=False)
+    return model.predictor.model
+
+
+def open_capture(video_source):
+    """优先以 FFmpeg 后端打开视频源并请求硬件解码，打不开时回退到默认后端"""
+    if hasattr(cv2, "CAP_PROP_HW_ACCELERATION"):
+        # 硬件解码参数需在打开时传入，打开后再 set 不生效
+        cap = cv2.VideoCapture(video_source, cv2.CAP_FFMPEG, [
+            cv2.CAP_PROP_HW_ACCELERATION, cv2.VIDEO_ACCELERATION_ANY,
+            cv2.CAP_PROP_HW_DEVICE, 0,
+        ])
+    else:
+        cap = cv2.VideoCapture(video_source, cv2.CAP_FFMPEG)
+    if not cap.isOpened():
+        cap.release()
+        cap = cv2.VideoCapture(video_source)
+    if isinstance(video_source, int):
+        # 摄像头只缓冲 1 帧，保证读取到最新画面
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+    return cap
+
+
+def collect_calib_frames(video_source, num_frames=CALIB_FRAMES):
+    """从视频源读取前若干帧作为量化校准集，只保留 letterbox 后的 640x640 图像以节省内存"""
+    cap = open_capture(video_source)
+    frames = []
+    while cap.isOpened() and len(frames) < num_frames:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        frames.append(letterbox(frame))
+    cap.release()
+    return frames
+
+
+def quantize_model(ir_dir, out_dir, calib_frames):
+    """使用 NNCF 对 OpenVINO IR 做训练后静态 INT8 量化，保存到 out_dir（应为 int8_dir_for 的结果）并返回该目录"""
+    import nncf
+    import openvino as ov
+
+    xml_name = next(f for f in os.listdir(ir_dir) if f.endswith(".xml"))
+    ov_model = ov.Core().read_model(os.path.join(ir_dir, xml_name))
+    quantized = nncf.quantize(
+        ov_model,
+        nncf.Dataset(calib_frames, preprocess_frame),
+        preset=nncf.QuantizationPreset.MIXED,  # 权重对称 int8，激活非对称 uint8
+        subset_size=len(calib_frames),
+        # 检测头的解码部分保持浮点，避免坐标精度损失
+        ignored_scope=nncf.IgnoredScope(types=["Multiply", "Subtract", "Sigmoid"]),
+    )
+
+    os.makedirs(out_dir, exist_ok=True)
+    ov.save_model(quantized, os.path.join(out_dir, xml_name), compress_to_fp16=False)
+    shutil.copy(os.path.join(ir_dir, "metadata.yaml"), out_dir)
+    return out_dir
@@ -0,0 +1,73 @@
+import numpy as np
+
+try:
+    from numba import njit
+except ImportError:
+    # 未安装 numba 时退化为普通 Python 函数
+    def njit(*args, **kwargs):
+        if args and callable(args[0]):
+            return args[0]
+        return lambda func: func
+
+# 按类别偏移坐标的步长，使不同类别的框互不重叠
+MAX_WH = 7680
+
+
+@njit(cache=True, fastmath=True)
+def nms_numba(boxes, scores, iou_thr):
+    """经典 NMS：按分数排序后逐个抑制 IoU 超过阈值的框，返回保留框的下标"""
+    n = boxes.shape[0]
+    x1, y1, x2, y2 = boxes[:, 0], boxes[:, 1], boxes[:, 2], boxes[:, 3]
+    areas = (x2 - x1) * (y2 - y1)
+    order = np.argsort(scores)[::-1]
+    suppressed = np.zeros(n, dtype=np.bool_)
+    keep = np.empty(n, dtype=np.int64)
+    k = 0
+    for a in range(n):
+        i = order[a]
+        if suppressed[i]:
+            continue
+        keep[k] = i
+        k += 1
+        for b in range(a + 1, n):
+            j = order[b]
+            if suppressed[j]:
+                continue
+            w = min(x2[i], x2[j]) - max(x1[i], x1[j])
+            h = min(y2[i], y2[j]) - max(y1[i], y1[j])
+            if w <= 0 or h <= 0:
+                continue
+            inter = w * h
+            if inter / (areas[i] + areas[j] - inter) > iou_thr:
+                suppressed[j] = True
+    return keep[:k]
+
+
+def batched_nms(boxes, scores, classes, iou_thr):
+    """按类别分别做 NMS（通过坐标偏移一次完成）"""
+    offset = classes.astype(boxes.dtype)[:, None] * MAX_WH
+    return nms_numba(np.ascontiguousarray(boxes + offset), np.ascontiguousarray(scores), iou_thr)
+
+
+def decode_predictions(pred, conf_thr, iou_thr, max_det=300):
+    """解码单张图的原始输出 (4+nc, N)，返回 NMS 后的 (k, 6) 数组 [x1, y1, x2, y2, conf, cls]
+
+    全部超过置信度阈值的候选框都参与 NMS，max_det 只截断抑制后的结果"""
+    pred = pred.T
+    cls = pred[:, 4:].argmax(1)
+    conf = pred[np.arange(pred.shape[0]), 4 + cls]
+    mask = conf > conf_thr
+    xywh, conf, cls = pred[mask, :4], conf[mask], cls[mask]
+
+    boxes = np.empty_like(xywh)
+    boxes[:, :2] = xywh[:, :2] - xywh[:, 2:] / 2
+    boxes[:, 2:] = xywh[:, :2] + xywh[:, 2:] / 2
+    keep = batched_nms(boxes, conf, cls, iou_thr)[:max_det]
+    return np.concatenate([boxes[keep], conf[keep, None], cls[keep, None].astype(boxes.dtype)], axis=1)
+
+
+def warmup():
+    """启动时触发一次 JIT 编译，避免首帧卡顿"""
+    boxes = np.random.rand(100, 4).astype(np.float32)
+    boxes[:, 2:] += boxes[:, :2]
+    batched_nms(boxes, np.random.rand(100).astype(np.float32), np.zeros(100, dtype=np.int32), 0.7)
@@ -1,13 +1,18 @@
 import sys
 import os
 import cv2
+import numpy as np
+import torch
 from PyQt5.QtWidgets import (
     QApplication, QMainWindow, QLabel, QPushButton, QVBoxLayout, QHBoxLayout,
     QWidget, QFileDialog, QMessageBox, QLineEdit
 )
 from PyQt5.QtGui import QPixmap, QImage
 from PyQt5.QtCore import Qt
-from ultralytics import YOLO
+from model_utils import (
+    load_optimized_model, configure_torch, configure_opencv, resize, bgr_to_rgb, read_image,
+    warmup_model, default_device
+)
 
 # 英文标签到中文名称的映射
 LABEL_MAP = {
@@ -27,6 +32,9 @@ PESTICIDE_DB = {
     'whorl-maggot': ["吡蚜酮", 35]
 }
 
+# 旧版 PyQt5 不支持 BGR888 时回退到 cvtColor + RGB888
+HAS_BGR888 = hasattr(QImage, 'Format_BGR888')
+
 class SimplePesticideApp(QMainWindow):
     def __init__(self):
         super().__init__()
@@ -34,8 +42,11 @@ class SimplePesticideApp(QMainWindow):
         self.resize(800, 600)
 
         self.model = None
+        self.device = default_device()  # 有 CUDA 时使用 GPU
         self.current_img = None
         self.pest_data = []  # 存储结构化的害虫数据
+        self._cls_info = []  # 类别 id -> (英文标签, 中文名称, 农药, 单位用量)
+        self._rgb_buf = None  # 复用的 RGB 转换缓冲区（仅无 BGR888 时使用）
 
         self.init_ui()
 
@@ -91,12 +102,22 @@ class SimplePesticideApp(QMainWindow):
             return
 
         try:
-            self.model = YOLO(file_name)
+            self.model = load_optimized_model(file_name, self.device)
+            self.statusBar().showMessage("正在预热模型...")
+            warmup_model(self.model, self.device, on_step=QApplication.processEvents)
+            self.build_cls_info()
             self.select_image_btn.setEnabled(True)
             self.statusBar().showMessage("模型加载成功")
         except Exception as e:
             QMessageBox.critical(self, "错误", f"加载模型失败：{str(e)}")
 
+    def build_cls_info(self):
+        """按类别 id 预先查好中文名称与农药信息，检测时直接下标访问"""
+        self._cls_info = [None] * len(self.model.names)
+        for cls_id, eng_label in self.model.names.items():
+            pesticide, dosage = PESTICIDE_DB.get(eng_label, ["未知", 0])
+            self._cls_info[cls_id] = (eng_label, LABEL_MAP.get(eng_label, eng_label), pesticide, dosage)
+
     def select_image(self):
         file_name, _ = QFileDialog.getOpenFileName(
             self, "选择图片文件", "", "图片文件 (*.jpg *.png *.bmp)"
@@ -105,57 +126,62 @@ class SimplePesticideApp(QMainWindow):
             return
 
         try:
-            self.current_img = cv2.imread(file_name)
+            self.current_img = read_image(file_name)
             self.display_image(self.current_img)
             self.run_detection_btn.setEnabled(True)
             self.statusBar().showMessage("图片加载成功")
         except Exception as e:
             QMessageBox.critical(self, "错误", f"加载图片失败：{str(e)}")
 
-    def display_image(self, img):
-        img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+    def display_image(self, img, target_w=500):
+        if img.shape[1] > target_w:
+            # 先缩小再转色，减少 cvtColor 处理的像素数
+            img = resize(img, (target_w, img.shape[0] * target_w // img.shape[1]),
+                         interpolation=cv2.INTER_AREA)
+        if HAS_BGR888:
+            # Qt 直接读取 OpenCV 的 BGR 排列，无需转色
+            if not img.flags['C_CONTIGUOUS']:
+                img = np.ascontiguousarray(img)
+            fmt = QImage.Format_BGR888
+        else:
+            if self._rgb_buf is None or self._rgb_buf.shape != img.shape:
+                self._rgb_buf = np.empty_like(img)
+            img = bgr_to_rgb(img, dst=self._rgb_buf)
+            fmt = QImage.Format_RGB888
+
         h, w, _ = img.shape
-        bytes_per_line = 3 * w
-        qt_image = QImage(img.data, w, h, bytes_per_line, QImage.Format_RGB888)
-        self.image_label.setPixmap(QPixmap.fromImage(qt_image).scaledToWidth(500))
+        qt_image = QImage(img.data, w, h, img.strides[0], fmt)
+        pixmap = QPixmap.fromImage(qt_image)  # fromImage 会复制像素，缓冲区可安全复用
+        if w != target_w:
+            pixmap = pixmap.scaledToWidth(target_w)
+        self.image_label.setPixmap(pixmap)
 
     def run_detection(self):
         if not self.model or self.current_img is None:
             return
 
         try:
-            results = self.model(self.current_img)
+            with torch.inference_mode():
+                results = self.model(self.current_img, device=self.device)
             annotated_img = results[0].plot()
             self.display_image(annotated_img)
 
             # 清空旧数据
             self.pest_data.clear()
 
-            # 统计害虫数据（结构化存储）
-            for box in results[0].boxes:
-                cls = int(box.cls)
-                eng_label = self.model.names[cls]
-                chi_name = LABEL_MAP.get(eng_label, eng_label)
-                pesticide, dosage = PESTICIDE_DB.get(eng_label, ["未知", 0])
+            # 统计害虫数据（按类别一次性聚合）
+            cls = results[0].boxes.cls.cpu().numpy().astype(np.int32)
+            counts = np.bincount(cls, minlength=len(self._cls_info))
+            for c in np.flatnonzero(counts):
+                eng_label, chi_name, pesticide, dosage = self._cls_info[c]
                 self.pest_data.append({
                     "english": eng_label,
                     "chinese": chi_name,
                     "pesticide": pesticide,
                     "base_dosage": dosage,
-                    "count": 1
+                    "count": int(counts[c])
                 })
 
-            # 聚合相同害虫
-            pest_dict = {}
-            for item in self.pest_data:
-                key = item["english"]
-                if key in pest_dict:
-                    pest_dict[key]["count"] += 1
-                else:
-                    pest_dict[key] = item.copy()
-
-            self.pest_data = list(pest_dict.values())
-
             self.update_recommendation()
             self.statusBar().showMessage("检测完成")
         except Exception as e:
@@ -187,6 +213,8 @@ class SimplePesticideApp(QMainWindow):
         self.result_label.setText("\n".join(result_lines))
 
 if __name__ == "__main__":
+    configure_torch()
+    configure_opencv()
     app = QApplication(sys.argv)
     window = SimplePesticideApp()
     window.show()